@@ -2,6 +2,8 @@
 
 Defines the structure storing the abstract pages.'''
 
+import itertools
+
 import elements
 
 class Abstract:
@@ -14,7 +16,8 @@ class Abstract:
     def __init__(self, abstractpages):
         '''Parameters:
             - abstractpages: list of page.Page, the Abstract pages'''
-        contents = sum(map((lambda p: p.content), abstractpages), start=[])
+        contents = list(itertools.chain.from_iterable(p.content
+                                                      for p in abstractpages))
         self.titleline = contents[0]
         self.noteline = contents[1]
         self.elements = list()
@@ -5,15 +5,55 @@ Contains definitions about the various structuring elements that make up a page.
 
 import sys
 
-class Text:
+# The level of an UnorderedListItem, by bullet
+BULLETLEVELS = {'—': 1, '•': 2}
+# The footnotes of elements that do not reference any, shared until the first
+# footnote gets added
+NOFOOTNOTES = frozenset()
+
+class FootnotesHolder:
+    '''An element whose content may reference footnotes.
+
+    Attributes:
+        - footnotes: set or frozenset of int, the footnotes present in the
+          content; it may be the shared NOFOOTNOTES frozenset, so register
+          footnotes with addfootnote, not footnotes.add (|= is fine, it rebinds
+          a frozenset)'''
+    __slots__ = ('footnotes',)
+
+    def addfootnote(self, footnote):
+        '''addfootnote(self, footnote): Register a footnote in the content.
+
+        Parameters:
+            - footnote: int, the footnote number'''
+        if not isinstance(self.footnotes, set):
+            self.footnotes = set(self.footnotes)
+        self.footnotes.add(footnote)
+
+class Text(FootnotesHolder):
     '''A text container.
 
     Attributes:
         - content: str, the text of the paragraph
-        - footnotes: set of int, the footnotes present in the content'''
+        - footnotes: see FootnotesHolder
+
+    The content is stored as a list of chunks, which only get joined when the
+    content is read.'''
+    __slots__ = ('_chunks',)
+
     def __init__(self, content):
-        self.content = content.strip()
-        self.footnotes = set()
+        self._chunks = [content.strip()]
+        self.footnotes = NOFOOTNOTES
+
+    @property
+    def content(self):
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0]
+
+    @content.setter
+    def content(self, content):
+        self._chunks = [content]
 
     def addcontent(self, content):
         '''addcontent(self, content): Append to the contents.
@@ -24,10 +64,18 @@ class Text:
         If the last word of the paragraph starts with "http://", the content
         gets concatenated directly. Otherwise, the content is concatenated with
         a newline character'''
-        if self.content.split()[-1][:7] == "http://":
-            self.content += content.strip()
-        else:
-            self.content += '\n' + content.strip()
+        chunks = self._chunks
+        content = content.strip()
+        tail = chunks[-1]
+        if (len(chunks) > 1
+                and not (tail[:1].isspace() and not tail.isspace())):
+            # the last chunk may not hold a whole word
+            tail = self.content
+            chunks = self._chunks
+        if tail.rsplit(maxsplit=1)[-1].startswith("http://"):
+            chunks.append(content)
+            return
+        chunks.append('\n' + content)
 
     def __str__(self):
         return self.content.replace('\n', r"\n")
@@ -35,12 +83,14 @@ class Text:
 class Paragraph(Text):
     '''Attributes:
         - content: str, see Text'''
-    pass
+    __slots__ = ()
 
 class NumberedParagraph(Paragraph):
     '''Attributes:
         - number: int, the number associated to the paragraph
         - content: str, see Text'''
+    __slots__ = ('number',)
+
     def __init__(self, number, content):
         self.number = number
         Paragraph.__init__(self, content)
@@ -53,23 +103,24 @@ class UnorderedListItem(Text):
         - indent: int, the number of spaces to expect at the beginning of
           similar items
         - see Text'''
+    __slots__ = ('level', 'indent')
+
     def __init__(self, line):
+        stripped = line.lstrip()
         try:
-            (bullet, content) = line.split(maxsplit=1)
+            (bullet, content) = stripped.split(maxsplit=1)
         except ValueError:
             print("Could not split bullet", file=sys.stderr)
             print(line, file=sys.stderr)
             raise
         else:
-            if bullet == '—':
-                self.level = 1
-            elif bullet == '•':
-                self.level = 2
-            else:
+            try:
+                self.level = BULLETLEVELS[bullet]
+            except KeyError:
                 print("Unknown bullet:", bullet, file=sys.stderr)
                 print(line, file=sys.stderr)
                 raise NotImplementedError
-            self.indent = len(line) - len(line.lstrip())
+            self.indent = len(line) - len(stripped)
             Text.__init__(self, content)
 
     def __repr__(self):
@@ -81,6 +132,8 @@ class OrderedListItem(Text):
     Attributes:
         - number: int, the number of the item
         - see Text'''
+    __slots__ = ('number',)
+
     def __init__(self, line):
         try:
             (number, content) = line.split(maxsplit=1)
@@ -134,15 +187,17 @@ class NumberedTitleHeading(NumberedHeading, TitleHeading):
                 + ' '
                 + TitleHeading.__repr__(self))
 
-class Code:
+class Code(FootnotesHolder):
     '''A text container. The contents are not left-stripped.
 
     Attributes:
         - lines: list of str, the lines of content
-        - footnotes: set of int, the footnotes present in the content'''
+        - footnotes: see FootnotesHolder'''
+    __slots__ = ('lines',)
+
     def __init__(self, content):
         self.lines = list()
-        self.footnotes = set()
+        self.footnotes = NOFOOTNOTES
         self.addcontent(content)
 
     def addcontent(self, content):
@@ -159,6 +214,8 @@ class NumberedCode(Code):
     '''Attributes:
         - number: int, the number associated to the code block
         - lines: list of str, see Code'''
+    __slots__ = ('number',)
+
     def __init__(self, number, content):
         self.number = number
         Code.__init__(self, content)
@@ -169,6 +226,8 @@ class ValueDefinition(Text):
     Attributes:
         - value: str, the value being defined
         - see Text'''
+    __slots__ = ('value',)
+
     def __init__(self, value, content):
         value = value.strip()
         self.value = value[:-1] if value[-1] == ':' else value
@@ -181,6 +240,8 @@ class NumberedValueDefinition(ValueDefinition):
     '''Attributes:
         - number: int, the number associated to the definition
         - see ValueDefinition'''
+    __slots__ = ('number',)
+
     def __init__(self, number, value, content):
         self.number = number
         ValueDefinition.__init__(self, value, content)
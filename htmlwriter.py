@@ -3,6 +3,7 @@
 This package implements objects that eat pages.StructuredPages and turns them
 into HTML.'''
 
+import functools
 import html
 import re
 import sys
@@ -11,6 +12,20 @@ import elements
 import pages
 import toc
 
+# Placeholders, as put by pages.StructuredPage and linker, in one alternation so
+# that strings are scanned only once: an annex or clause link keeping the word
+# before it (groups 1 and 2, or 3 and 4), or a footnote or link (groups 5 and 6)
+PLACEHOLDER = re.compile(
+    f"(annex\\s)\x1blink({toc.ANNEXREGEX})\x1b"
+    f"|(clause\\s)\x1blink({toc.CHAPTERREGEX})\x1b"
+    "|\x1b(footnote|link)(.*?)\x1b")
+# Any character htmlformat may have to change
+SPECIALCHARACTERS = re.compile("[\x03\x06\x07\x1b&<>\"'\n]")
+# Indentation of the HTML lines, by depth, grown as needed by Tag
+INDENTS = [""]
+# Longest string whose formatting gets memoized; longer ones rarely repeat
+MAXCACHEDLENGTH = 256
+
 def htmlformat(string, newlines=True):
     '''htmlformat(string): Replace placeholders and special characters.
 
@@ -19,6 +34,14 @@ def htmlformat(string, newlines=True):
         - newlines: bool, optional (default: True), should newlines be augmented
           with <br>
     '''
+    if SPECIALCHARACTERS.search(string) is None:
+        # nothing to replace nor escape
+        return string
+    if len(string) <= MAXCACHEDLENGTH:
+        return _cachedformatspecial(string, newlines)
+    return _formatspecial(string, newlines)
+
+def _formatspecial(string, newlines):
     string = string.replace("| \x03X", "|  \x03X")
     string = string.replace('\x03', '□')
     string = string.replace('\x06', '')
@@ -26,23 +49,33 @@ def htmlformat(string, newlines=True):
     string = html.escape(string)
     if newlines:
         string = string.replace('\n', "<br>\n")
-    string = re.sub("\x1bfootnote(.*?)\x1b",
-                    r'<a href="#footnote\g<1>" class="footnote">\g<1>)</a>',
-                    string)
-    string = re.sub("\x1blinkhttp(.*?)\x1b",
-                    r'<a href="http\g<1>">http\g<1></a>', string)
-    string = re.sub(f"(annex\\s)\x1blink({toc.ANNEXREGEX})\x1b",
-                    r'<a href="#\g<2>">\g<1>\g<2></a>', string)
-    string = re.sub(f"(clause\\s)\x1blink({toc.CHAPTERREGEX})\x1b",
-                    r'<a href="#\g<2>">\g<1>\g<2></a>', string)
-    string = re.sub("\x1blink(.*?)\x1b", r'<a href="#\g<1>">\g<1></a>', string)
+    string = PLACEHOLDER.sub(_placeholdertohtml, string)
     return string
 
+def _placeholdertohtml(match):
+    kind, contents = match.group(5, 6)
+    if kind is None:
+        prefix = match.group(1) or match.group(3)
+        key = match.group(2) or match.group(4)
+        return f'<a href="#{key}">{prefix}{key}</a>'
+    if kind == "footnote":
+        return f'<a href="#footnote{contents}" class="footnote">{contents})</a>'
+    if contents.startswith("http"):
+        return f'<a href="{contents}">{contents}</a>'
+    return f'<a href="#{contents}">{contents}</a>'
+
+_cachedformatspecial = functools.lru_cache(maxsize=8192)(_formatspecial)
+
 class Tag:
     '''Attributes:
         - tag: str, the type of tag
         - attributes: str or None, the attributes on the tag
-        - contents: str or Tag or list of str or Tag, the contents of the tag'''
+        - contents: str or Tag or list of str or Tag, the contents of the tag
+
+    Strings are split into lines when added, so that every str in contents is
+    a single line.'''
+    __slots__ = ('tag', 'attributes', 'contents', 'number')
+
     def __init__(self, tag, contents=None):
         '''tag is split into self.tag and self.attributes'''
         split = tag.split(maxsplit=1)
@@ -85,24 +118,39 @@ class Tag:
                     res += "\n  " + line
         return res
 
-    def tohtml(self):
-        '''tohtml(self): Turn the Tag into an HTML string'''
-        res = '<' + self.tag
-        if self.attributes is not None:
-            res += ' ' + self.attributes
-        res += ">\n"
+    def _tohtml(self, write, depth):
+        while len(INDENTS) <= depth + 1:
+            INDENTS.append("  " * len(INDENTS))
+        indent = INDENTS[depth]
+        if self.attributes is None:
+            write(f"{indent}<{self.tag}>\n")
+        else:
+            write(f"{indent}<{self.tag} {self.attributes}>\n")
         if self.attributes and self.attributes[-1] == '/':
             # self closing, no-content tag
-            return res
+            return
+        contentindent = INDENTS[depth + 1]
         for content in self.contents:
             if isinstance(content, Tag):
-                string = content.tohtml()
-            else:
-                string = content
-            for line in string.splitlines():
-                res += "  " + line + '\n'
-        res += "</" + self.tag + ">\n"
-        return res
+                content._tohtml(write, depth + 1)
+            elif content:
+                write(contentindent + content + '\n')
+        write(f"{indent}</{self.tag}>\n")
+
+    def tohtml(self):
+        '''tohtml(self): Turn the Tag into an HTML string'''
+        out = list()
+        self._tohtml(out.append, 0)
+        return ''.join(out)
+
+    def writeto(self, file):
+        '''writeto(self, file): Write the Tag as HTML to a file.
+
+        Same as file.write(self.tohtml()), without building the whole string.
+
+        Parameters:
+            - file: file object, open for writing text'''
+        self._tohtml(file.write, 0)
 
 def footnotetohtml(footnoteid, elems):
     '''footnotetohtml(footnoteid, elems): Turn a footnote into a HTML tag.
@@ -151,169 +199,197 @@ def eatStructuredPage(root, page):
         dumpedfootnotes.update(todumpfootnotes)
         todumpfootnotes = set()
 
-    for i, elem in enumerate(page.elements):
-        if isinstance(elem, elements.Text) or isinstance(elem, elements.Code):
-            todumpfootnotes.update(elem.footnotes)
-        if type(elem) is elements.Paragraph:
-            # If:
-            #   paragraph is sandwidched between unorderedlistitems
-            #   and the previous is deeper that the next
-            if (tagstack
-                    and i < len(page.elements) - 1
-                    and tagstack[-1].tag == "li"
-                    and (type(page.elements[i - 1])
-                         == type(page.elements[i + 1])
-                         == elements.UnorderedListItem)
-                    and (page.elements[i - 1].level
-                         > page.elements[i + 1].level)):
-                # Paragraph belongs to the parent li of the previous li
-                tagstack.pop() # pop li, top is ul
-                tagstack.pop() # pop ul, top is li
-                p = Tag("p", htmlformat(elem.content))
-                tagstack[-1].contents.append(p)
-                tagstack.append(p)
-                continue
+    def eatparagraph(i, elem):
+        nonlocal tagstack
+        # If:
+        #   paragraph is sandwidched between unorderedlistitems
+        #   and the previous is deeper that the next
+        if (tagstack
+                and i < len(page.elements) - 1
+                and tagstack[-1].tag == "li"
+                and (type(page.elements[i - 1])
+                     == type(page.elements[i + 1])
+                     == elements.UnorderedListItem)
+                and (page.elements[i - 1].level
+                     > page.elements[i + 1].level)):
+            # Paragraph belongs to the parent li of the previous li
+            tagstack.pop() # pop li, top is ul
+            tagstack.pop() # pop ul, top is li
             p = Tag("p", htmlformat(elem.content))
-            tagstack = [p]
-            root.add(p)
-            continue
-        if type(elem) is elements.NumberedParagraph:
-            parkey = f"{key}.p{elem.number}"
-            p = Tag(f'p id="{parkey}"')
-            aside = Tag("aside", f'<a href="#{parkey}">{elem.number}</a>')
-            p.contents.append(aside)
-            p.contents.append(htmlformat(elem.content))
-            tagstack = [p]
-            root.add(p)
-            continue
-        if type(elem) is elements.UnorderedListItem:
-            depthli = elem.level * 2 - 1
-            depthul = depthli - 1
-            # 3 cases:
-            #   - unordered list already exists at this level, add to it
-            #   - unordered list exists at the previous level, create nested
-            #     list
-            #   - create unordered list at root level
-            if len(tagstack) > depthul and tagstack[depthul].tag == "ul":
-                # unordered list already exists at this level, add to it
-                li = Tag("li", htmlformat(elem.content))
-                tagstack[depthul].add(li)
-                # pop everything at depthli and above, push li
-                tagstack[depthli:] = [li]
-                continue
-            if (depthul - 2 >= 0
-                    and len(tagstack) > depthul - 1
-                    and tagstack[depthul - 2].tag == "ul"
-                    and tagstack[depthul - 1].tag == "li"):
-                # unordered list exists at the previous level, create nested
-                # list
-                li = Tag("li", htmlformat(elem.content))
-                ul = Tag("ul", li)
-                tagstack[depthul - 1].add(ul)
-                # pop everything at depthul and above, push ul, push li
-                tagstack[depthul:] = [ul, li]
-                continue
-            if depthul == 0:
-                # create unordered list at root level
-                li = Tag("li", htmlformat(elem.content))
-                ul = Tag("ul", li)
-                tagstack = [ul, li]
-                root.add(ul)
-                continue
-            print("Invalid UnorderedListItem depth:", elem.level,
-                  file=sys.stderr)
-            print(elem, file=sys.stderr)
-            print("tagstack:", [t.tag for t in tagstack], file=sys.stderr)
-            print(repr(root.contents[-1]), file=sys.stderr)
-            raise RuntimeError
-        if type(elem) is elements.OrderedListItem:
-            if len(tagstack) >= 2 and tagstack[0].tag == 'ol':
-                if tagstack[1].number + 1 != elem.number:
-                    print("Non-consecutive OrderedListItems:",
-                          tagstack[1].number, "and", elem.number,
-                          file=sys.stderr)
-                    print(elem, file=sys.stderr)
-                    print(repr(root), file=sys.stderr)
-                    print("tagstack:", [t.tag for t in tagstack],
-                          file=sys.stderr)
-                    raise RuntimeError
-                tagstack[1:] = [] # pop everything above ol, top is ol
-                li = Tag("li", htmlformat(elem.content))
-                li.number = elem.number
-                tagstack[0].add(li)
-                tagstack.append(li)
-                continue
-            if elem.number != 1:
-                print("Ordered list starting at", elem.number, file=sys.stderr)
+            tagstack[-1].contents.append(p)
+            tagstack.append(p)
+            return
+        p = Tag("p", htmlformat(elem.content))
+        tagstack = [p]
+        root.add(p)
+
+    def eatnumberedparagraph(i, elem):
+        nonlocal tagstack
+        parkey = f"{key}.p{elem.number}"
+        p = Tag(f'p id="{parkey}"')
+        aside = Tag("aside", f'<a href="#{parkey}">{elem.number}</a>')
+        p.add(aside)
+        p.add(htmlformat(elem.content))
+        tagstack = [p]
+        root.add(p)
+
+    def eatunorderedlistitem(i, elem):
+        nonlocal tagstack
+        depthli = elem.level * 2 - 1
+        depthul = depthli - 1
+        # 3 cases:
+        #   - unordered list already exists at this level, add to it
+        #   - unordered list exists at the previous level, create nested
+        #     list
+        #   - create unordered list at root level
+        if len(tagstack) > depthul and tagstack[depthul].tag == "ul":
+            # unordered list already exists at this level, add to it
+            li = Tag("li", htmlformat(elem.content))
+            tagstack[depthul].add(li)
+            # pop everything at depthli and above, push li
+            tagstack[depthli:] = [li]
+            return
+        if (depthul - 2 >= 0
+                and len(tagstack) > depthul - 1
+                and tagstack[depthul - 2].tag == "ul"
+                and tagstack[depthul - 1].tag == "li"):
+            # unordered list exists at the previous level, create nested
+            # list
+            li = Tag("li", htmlformat(elem.content))
+            ul = Tag("ul", li)
+            tagstack[depthul - 1].add(ul)
+            # pop everything at depthul and above, push ul, push li
+            tagstack[depthul:] = [ul, li]
+            return
+        if depthul == 0:
+            # create unordered list at root level
+            li = Tag("li", htmlformat(elem.content))
+            ul = Tag("ul", li)
+            tagstack = [ul, li]
+            root.add(ul)
+            return
+        print("Invalid UnorderedListItem depth:", elem.level,
+              file=sys.stderr)
+        print(elem, file=sys.stderr)
+        print("tagstack:", [t.tag for t in tagstack], file=sys.stderr)
+        print(repr(root.contents[-1]), file=sys.stderr)
+        raise RuntimeError
+
+    def eatorderedlistitem(i, elem):
+        nonlocal tagstack
+        if len(tagstack) >= 2 and tagstack[0].tag == 'ol':
+            if tagstack[1].number + 1 != elem.number:
+                print("Non-consecutive OrderedListItems:",
+                      tagstack[1].number, "and", elem.number,
+                      file=sys.stderr)
                 print(elem, file=sys.stderr)
+                print(repr(root), file=sys.stderr)
+                print("tagstack:", [t.tag for t in tagstack],
+                      file=sys.stderr)
                 raise RuntimeError
-            li = Tag("li", elem.content)
-            li.number = 1
-            ol = Tag("ol", li)
-            tagstack = [ol, li]
-            root.add(ol)
-            continue
-        if type(elem) is elements.TitleHeading:
-            dumpfootnotes()
-            if elem.content[:6] == "Annex ":
-                key = elem.content[6:]
-            else:
-                key = elem.content
-            h1 = Tag(f'h1 id="{key}"', f'<a href="#{key}">{elem.content}</a>')
-            root.add(h1)
-            continue
-        if type(elem) is elements.NumberedHeading:
-            dumpfootnotes()
-            level = elem.key.count('.') + 1
-            key = elem.key
-            h = Tag(f'h{level} id="{key}"', f'<a href="#{key}">{key}</a>')
-            root.add(h)
-            continue
-        if type(elem) is elements.NumberedTitleHeading:
-            dumpfootnotes()
-            key = elem.key
-            if key[-1] == '.':
-                key = key[:-1]
-            level = key.count('.') + 1
-            h = Tag(f'h{level} id="{key}"', f'<a href="#{key}">{elem.key} '
-                    f'{htmlformat(elem.content)}</a>')
-            root.add(h)
-            continue
-        if type(elem) is elements.Code:
-            lines = [htmlformat(l, False) for l in elem.lines]
-            if tagstack and tagstack[-1].tag == 'li':
-                pre = Tag("pre", lines)
-                tagstack[-1].add(pre)
-                continue
+            tagstack[1:] = [] # pop everything above ol, top is ol
+            li = Tag("li", htmlformat(elem.content))
+            li.number = elem.number
+            tagstack[0].add(li)
+            tagstack.append(li)
+            return
+        if elem.number != 1:
+            print("Ordered list starting at", elem.number, file=sys.stderr)
+            print(elem, file=sys.stderr)
+            raise RuntimeError
+        li = Tag("li", elem.content)
+        li.number = 1
+        ol = Tag("ol", li)
+        tagstack = [ol, li]
+        root.add(ol)
+
+    def eattitleheading(i, elem):
+        nonlocal key
+        dumpfootnotes()
+        if elem.content[:6] == "Annex ":
+            key = elem.content[6:]
+        else:
+            key = elem.content
+        h1 = Tag(f'h1 id="{key}"', f'<a href="#{key}">{elem.content}</a>')
+        root.add(h1)
+
+    def eatnumberedheading(i, elem):
+        nonlocal key
+        dumpfootnotes()
+        level = elem.key.count('.') + 1
+        key = elem.key
+        h = Tag(f'h{level} id="{key}"', f'<a href="#{key}">{key}</a>')
+        root.add(h)
+
+    def eatnumberedtitleheading(i, elem):
+        nonlocal key
+        dumpfootnotes()
+        key = elem.key
+        if key[-1] == '.':
+            key = key[:-1]
+        level = key.count('.') + 1
+        h = Tag(f'h{level} id="{key}"', f'<a href="#{key}">{elem.key} '
+                f'{htmlformat(elem.content)}</a>')
+        root.add(h)
+
+    def eatcode(i, elem):
+        nonlocal tagstack
+        lines = [htmlformat(l, False) for l in elem.lines]
+        if tagstack and tagstack[-1].tag == 'li':
             pre = Tag("pre", lines)
-            tagstack = list()
-            root.add(pre)
-            continue
-        if type(elem) is elements.NumberedCode:
-            parkey = f"{key}.p{elem.number}"
-            aside = Tag("aside", f'<a href="#{parkey}">{elem.number}</a>')
-            lines = [htmlformat(l, False) for l in elem.lines]
-            pre = Tag(f'pre id="#{parkey}"', lines)
-            div = Tag("div", aside)
-            div.add(pre)
-            tagstack = list()
-            root.add(div)
-            continue
-        if type(elem) is elements.ValueDefinition:
-            dt = Tag("dt", htmlformat(elem.value))
-            dd = Tag("dd", htmlformat(elem.content))
-            if tagstack and tagstack[0].tag == "dl":
-                tagstack[0].add(dt)
-                tagstack[0].add(dd)
-                continue
-            dl = Tag("dl", dt)
-            dl.add(dd)
-            tagstack = [dl]
-            root.add(dl)
-            continue
-
-        raise ValueError(
-            f"Unknown type of element: {elem.__class__.__name__}")
+            tagstack[-1].add(pre)
+            return
+        pre = Tag("pre", lines)
+        tagstack = list()
+        root.add(pre)
+
+    def eatnumberedcode(i, elem):
+        nonlocal tagstack
+        parkey = f"{key}.p{elem.number}"
+        aside = Tag("aside", f'<a href="#{parkey}">{elem.number}</a>')
+        lines = [htmlformat(l, False) for l in elem.lines]
+        pre = Tag(f'pre id="#{parkey}"', lines)
+        div = Tag("div", aside)
+        div.add(pre)
+        tagstack = list()
+        root.add(div)
+
+    def eatvaluedefinition(i, elem):
+        nonlocal tagstack
+        dt = Tag("dt", htmlformat(elem.value))
+        dd = Tag("dd", htmlformat(elem.content))
+        if tagstack and tagstack[0].tag == "dl":
+            tagstack[0].add(dt)
+            tagstack[0].add(dd)
+            return
+        dl = Tag("dl", dt)
+        dl.add(dd)
+        tagstack = [dl]
+        root.add(dl)
+
+    # The functions eating each type of element, by exact type
+    eaters = {
+        elements.Paragraph: eatparagraph,
+        elements.NumberedParagraph: eatnumberedparagraph,
+        elements.UnorderedListItem: eatunorderedlistitem,
+        elements.OrderedListItem: eatorderedlistitem,
+        elements.TitleHeading: eattitleheading,
+        elements.NumberedHeading: eatnumberedheading,
+        elements.NumberedTitleHeading: eatnumberedtitleheading,
+        elements.Code: eatcode,
+        elements.NumberedCode: eatnumberedcode,
+        elements.ValueDefinition: eatvaluedefinition,
+    }
+
+    geteater = eaters.get
+    for i, elem in enumerate(page.elements):
+        if isinstance(elem, elements.FootnotesHolder):
+            todumpfootnotes.update(elem.footnotes)
+        eater = geteater(type(elem))
+        if eater is None:
+            raise ValueError(
+                f"Unknown type of element: {elem.__class__.__name__}")
+        eater(i, elem)
 
     dumpfootnotes()
     return dumpedfootnotes
@@ -340,12 +416,14 @@ def eatTOC(root, t):
     # n dots is a child of levels[n][1]
     levels = [(None, main)]
     lastli = None
+    lastkey = None # the key of lastli
     for title, key in t.titles:
         if key is None:
             if title[:6] == "Annex ":
                 key = title[6]
                 li = Tag("li", f'<a href="#{key}">{title}</a>')
                 lastli = li
+                lastkey = key
             else:
                 li = Tag("li", f'<a href="#{title}">{title}</a>')
                 lastli = None
@@ -358,14 +436,15 @@ def eatTOC(root, t):
                 # one deeper than the last
                 ul = Tag("ul", li)
                 lastli.add(ul)
-                lastkey = lastli.contents[0].split(maxsplit=1)[0]
                 levels.append((lastkey, ul))
                 lastli = li
+                lastkey = key
             elif level < len(levels):
                 # same level or higher that last
                 levels[level + 1:] = []
                 levels[level][1].add(li)
                 lastli = li
+                lastkey = key
             else:
                 print("Invalid TOC hierarchy", file=sys.stderr)
                 print("Entry:", key, title, file=sys.stderr)
@@ -30,6 +30,67 @@ LEVEL2 = fr"(?:{LEVEL1})(?:\.\d+)+"
 # - "in LEVEL1"
 # - "subclause LEVEL1", "Subclause LEVEL1"
 
+# Placeholders, as replacements for the regexes below
+PLACEHOLDER0 = "\x1blink\\g<0>\x1b" # link whole match
+PLACEHOLDER2 = "\\g<1>\x1blink\\g<2>\x1b" # keep group 1, link group 2
+# keep groups 1 and 3, link group 2
+PLACEHOLDER3 = "\\g<1>\x1blink\\g<2>\x1b\\g<3>"
+# keep groups 1 and 3, link groups 2 and 4
+PLACEHOLDER4 = "\\g<1>\x1blink\\g<2>\x1b\\g<3>\x1blink\\g<4>\x1b"
+
+# Simple http url regex. Fancier means more universal means more wrong matches.
+HTTPLINK = re.compile("https?://[-a-zA-Z0-9_/.]+[a-zA-Z0-9_/]")
+KEYLINK = re.compile(toc.KEYREGEX)
+LEVEL2LINK = re.compile(LEVEL2)
+CLAUSELINK = re.compile(fr"(clause\s)({toc.CHAPTERREGEX})")
+CLAUSESLINK = re.compile(
+    fr"(clauses\s)({toc.CHAPTERREGEX})(–)({toc.CHAPTERREGEX})")
+ANNEXLINK = re.compile(fr"(annex\s)({toc.ANNEXREGEX})")
+SQUAREBRACKETSLINK = re.compile(fr"(\[)({LEVEL1})(\])")
+ROUNDBRACKETSLINK = re.compile(fr"(\s\()({LEVEL1})(\))")
+SEEBYINLINK = re.compile(fr"((?:see|by|in)\s)({LEVEL1})")
+SUBCLAUSELINK = re.compile(fr"([Ss]ubclause\s)({LEVEL1})")
+
+def _linkwholematches(regex, string):
+    # Same as regex.sub(PLACEHOLDER0, string), without going through the
+    # template
+    parts = list()
+    end = 0
+    for match in regex.finditer(string):
+        parts.append(string[end:match.start()])
+        parts.append("\x1blink")
+        parts.append(match.group())
+        parts.append("\x1b")
+        end = match.end()
+    if not parts:
+        return string
+    parts.append(string[end:])
+    return ''.join(parts)
+
+def _putlinksplaceholders(string):
+    # Each regex is only run if the string holds a substring it needs. LEVEL1
+    # and LEVEL2 always contain a dot, and placeholders never remove one.
+    hasdot = '.' in string
+    if "http" in string:
+        string = _linkwholematches(HTTPLINK, string)
+    if hasdot:
+        string = _linkwholematches(LEVEL2LINK, string)
+    if "clause" in string:
+        string = CLAUSELINK.sub(PLACEHOLDER2, string)
+        string = CLAUSESLINK.sub(PLACEHOLDER4, string)
+    if "annex" in string:
+        string = ANNEXLINK.sub(PLACEHOLDER2, string)
+    if not hasdot:
+        return string
+    if '[' in string:
+        string = SQUAREBRACKETSLINK.sub(PLACEHOLDER3, string)
+    if '(' in string:
+        string = ROUNDBRACKETSLINK.sub(PLACEHOLDER3, string)
+    string = SEEBYINLINK.sub(PLACEHOLDER2, string)
+    if "ubclause" in string:
+        string = SUBCLAUSELINK.sub(PLACEHOLDER2, string)
+    return string
+
 def putlinksplaceholders(elems):
     r'''putlinksplaceholders(elems): Identify links and replace them with
     placeholders.
@@ -39,37 +100,10 @@ def putlinksplaceholders(elems):
 
     Linking happens inplace, and only on elements.Text instances. Placeholders
     are of the form "\x1blink<contents>\x1b".'''
-    placeholder0 = "\x1blink\\g<0>\x1b" # link whole match
-    placeholder2 = "\\g<1>\x1blink\\g<2>\x1b" # keep group 1, link group 2
-    # keep groups 1 and 3, link group 2
-    placeholder3 = "\\g<1>\x1blink\\g<2>\x1b\\g<3>"
-    # keep groups 1 and 3, link groups 2 and 4
-    placeholder4 = "\\g<1>\x1blink\\g<2>\x1b\\g<3>\x1blink\\g<4>\x1b"
-    # Simple http url regex. Fancier means more universal means more wrong
-    # matches.
-    http = re.compile("https?://[-a-zA-Z0-9_/.]+[a-zA-Z0-9_/]")
-    key = re.compile(toc.KEYREGEX)
-    level2 = re.compile(LEVEL2)
-    clause = re.compile(fr"(clause\s)({toc.CHAPTERREGEX})")
-    clauses = re.compile(
-        fr"(clauses\s)({toc.CHAPTERREGEX})(–)({toc.CHAPTERREGEX})")
-    annex = re.compile(fr"(annex\s)({toc.ANNEXREGEX})")
-    squarebrackets = re.compile(fr"(\[)({LEVEL1})(\])")
-    roundbrackets = re.compile(fr"(\s\()({LEVEL1})(\))")
-    seebyin = re.compile(fr"((?:see|by|in)\s)({LEVEL1})")
-    subclause = re.compile(fr"([Ss]ubclause\s)({LEVEL1})")
     for element in elems:
         if not isinstance(element, elements.Text):
             continue
-        if element.content[:20] == "Forward references: ":
-            element.content = key.sub(placeholder0, element.content)
+        if element.content.startswith("Forward references: "):
+            element.content = KEYLINK.sub(PLACEHOLDER0, element.content)
             continue
-        element.content = http.sub(placeholder0, element.content)
-        element.content = level2.sub(placeholder0, element.content)
-        element.content = clause.sub(placeholder2, element.content)
-        element.content = clauses.sub(placeholder4, element.content)
-        element.content = annex.sub(placeholder2, element.content)
-        element.content = squarebrackets.sub(placeholder3, element.content)
-        element.content = roundbrackets.sub(placeholder3, element.content)
-        element.content = seebyin.sub(placeholder2, element.content)
-        element.content = subclause.sub(placeholder2, element.content)
+        element.content = _putlinksplaceholders(element.content)
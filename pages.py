@@ -16,6 +16,9 @@ import elements
 import parser
 import utils
 
+# A line starting a footnote: indented number, closing parenthesis, text
+FOOTNOTELINE = re.compile(r"^\s+\d+\)\s?\S")
+
 class Page:
     '''A page, split into: header, content, footer.
 
@@ -30,39 +33,39 @@ class Page:
     the beginning of all content lines where only paragraph numbering can be
     found.
     '''
+    __slots__ = ('header', 'footer', 'content', 'indent')
+
     def __init__(self, page):
         '''
         Parameters:
             - page: str, the page'''
         lines = [line.rstrip() for line in page.split('\n')]
-        header = 0
-        while not lines[header]:
-            header += 1
-        footer = len(lines) - 1
-        while not lines[footer]:
-            footer -= 1
-
-        contentbegin = header + 1
-        while not lines[contentbegin]:
-            contentbegin += 1
-        contentend = footer - 1
-        while not lines[contentend]:
-            contentend -= 1
+        nonempty = [i for i, line in enumerate(lines) if line]
+        header = nonempty[0]
+        footer = nonempty[-1]
+
+        contentbegin = nonempty[1]
+        contentend = nonempty[-2]
 
         contentlines = lines[contentbegin:contentend+1]
 
-        indents = sorted(set(len(line) - len(line.lstrip())
-                             for line in contentlines
-                             if line))
+        # non-empty content lines, by number of columns of leading whitespace
+        bylead = dict()
+        for line in contentlines:
+            if line:
+                lead = len(line) - len(line.lstrip())
+                bylead.setdefault(lead, []).append(line)
+        indents = sorted(bylead)
         if indents[0] == 0 and len(indents) >= 2:
             # there are different indents, we need to find the maximal one such
             # that only paragraph numbers are under the indent
-            def checkonlynumbersinmargin(lines, margin):
-                if margin == 0:
-                    return True
-
-                for line in lines:
-                    if line[:margin].strip():
+            def checkonlynumbersinmargin(margin):
+                # only the lines with less leading whitespace than the margin
+                # have something under it
+                for lead in indents:
+                    if margin <= lead:
+                        break
+                    for line in bylead[lead]:
                         try:
                             int(line[:margin])
                         except ValueError:
@@ -70,16 +73,16 @@ class Page:
                 return True
             # initial estimation
             indent = indents[1]
-            if checkonlynumbersinmargin(contentlines, indent):
+            if checkonlynumbersinmargin(indent):
                 # the initial estimation is good, try to increase
                 indent += 1
-                while checkonlynumbersinmargin(contentlines, indent):
+                while checkonlynumbersinmargin(indent):
                     indent += 1
                 indent -= 1
             else:
                 # the initial estimation is not good, try to decrease
                 while (indent > 0
-                       and not checkonlynumbersinmargin(contentlines, indent)):
+                       and not checkonlynumbersinmargin(indent)):
                     indent -= 1
             self.indent = indent
         else:
@@ -98,34 +101,38 @@ class StructuredPage:
           contents of the page
         - footnotes: dict of int to list of various classes from the elements
           module, the footnotes of the page'''
+    __slots__ = ('elements', 'footnotes')
+
     def __init__(self, page, tocmatcher, startline=0):
         '''Parameters:
             - page: Page, the page to parse
             - tocmatcher: toc.TOCMatcher, the TOCMatcher object
             - startline: int, optional (default: 0), amount of lines to skip
               from the beginning of page'''
-        footnoteregex = re.compile(r"^\s+\d+\)\s?\S")
+        content = page.content
+        isfootnoteline = FOOTNOTELINE.match
         lineparser = parser.LineParser(page.indent)
+        parseline = lineparser.parseline
         i = startline
-        while i < len(page.content):
-            line = page.content[i]
-            if footnoteregex.match(line):
+        while i < len(content):
+            line = content[i]
+            # a footnote has a ")" after its number
+            if ')' in line and isfootnoteline(line):
                 break
-            lineparser.parseline(line, tocmatcher)
+            parseline(line, tocmatcher)
             i += 1
         footnotesbegin = i
 
         self.elements = lineparser.elements
         self.footnotes = dict()
 
-        if footnotesbegin == len(page.content):
+        if footnotesbegin == len(content):
             return # no footnotes
 
-        footnotes = dict() # int to parser
-        lastfootnote = None
-        for line in page.content[footnotesbegin:]:
+        lastparser = None
+        for line in content[footnotesbegin:]:
             try:
-                if footnoteregex.match(line):
+                if ')' in line and isfootnoteline(line):
                     footnote, text = line.split(')', maxsplit=1)
                     try:
                         footnote = int(footnote)
@@ -133,19 +140,17 @@ class StructuredPage:
                         print("Could not parse footnote number",
                               file=sys.stderr)
                         raise
-                    footnotes[footnote] = parser.LineParser(page.indent)
-                    footnotes[footnote].parseline(text, tocmatcher, 0)
-                    lastfootnote = footnote
+                    lastparser = parser.LineParser(page.indent)
+                    lastparser.parseline(text, tocmatcher, 0)
+                    # the list of elements keeps growing with the parser
+                    self.footnotes[footnote] = lastparser.elements
                 else:
-                    footnotes[lastfootnote].parseline(line, tocmatcher)
+                    lastparser.parseline(line, tocmatcher)
             except:
-                print(footnotes)
+                print(self.footnotes)
                 print(line, sys.stderr)
                 raise
 
-        for f, p in footnotes.items():
-            self.footnotes[f] = p.elements
-
     def __repr__(self):
         elementstr = '\n'.join(f"{e.__class__.__name__:25}{e}"
                                for e in self.elements)
@@ -162,20 +167,27 @@ class StructuredPage:
         Remove spaces that are present at the beginning of all lines in a code
         block.'''
         def reindentlines(lines):
-            indents = [len(l) - len(l.lstrip())
-                       for l in lines
-                       if l]
-            margin = min(indents)
-            return [l[margin:] for l in lines]
+            # inplace
+            margin = None
+            for l in lines:
+                if l:
+                    indent = len(l) - len(l.lstrip())
+                    if margin is None or indent < margin:
+                        if indent == 0:
+                            # nothing to remove
+                            return
+                        margin = indent
+            if margin is not None:
+                for i, l in enumerate(lines):
+                    lines[i] = l[margin:]
 
         for e in self.elements:
             if isinstance(e, elements.Code):
-                e.lines = reindentlines(e.lines)
-        for footnote, elems in self.footnotes.items():
-            for i, elem in enumerate(elems):
+                reindentlines(e.lines)
+        for elems in self.footnotes.values():
+            for elem in elems:
                 if isinstance(elem, elements.Code):
-                    self.footnotes[footnote][i].lines = (
-                        reindentlines(elem.lines))
+                    reindentlines(elem.lines)
 
     def reworkfootnotes(self):
         '''reworkfootnotes(self): Rework the elements of footnotes.
@@ -184,56 +196,50 @@ class StructuredPage:
         which may lead to weird parsing. Instead of having specific parsing
         rules for footnotes, we parse them just like usual content, and fix them
         with this method.'''
-        for footnote in self.footnotes.keys():
-            if self.footnotes[footnote]:
+        for elems in self.footnotes.values():
+            if elems:
                 # remove extraneous spacing between the first two words
-                if isinstance(self.footnotes[footnote][0], elements.Paragraph):
-                    splits = (self.footnotes[footnote][0]
-                              .content.split(maxsplit=1))
+                if isinstance(elems[0], elements.Paragraph):
+                    splits = elems[0].content.split(maxsplit=1)
                     if len(splits) == 2:
-                        self.footnotes[footnote][0] = (
-                            elements.Paragraph(' '.join(splits)))
+                        elems[0] = elements.Paragraph(' '.join(splits))
                     else: # only one word in the first paragraph, that's fishy
-                        if isinstance(self.footnotes[footnote][1],
-                                      elements.Code):
-                            lines = self.footnotes[footnote][1].lines
+                        if isinstance(elems[1], elements.Code):
+                            lines = elems[1].lines
                             # avoid extra newline with the first line
-                            self.footnotes[footnote][0].content += (' '
-                                                                    + lines[0])
+                            elems[0].content += ' ' + lines[0]
                             # turn the other lines into paragraphs, they'll get
                             # sorted out later on
                             newpars = list()
                             for line in lines[1:]:
                                 newpars.append(elements.Paragraph(line))
                             # replace the Code with the Paragraphs
-                            self.footnotes[footnote][1:2] = newpars
-                elif isinstance(self.footnotes[footnote][0],
-                                elements.ValueDefinition):
-                    newparcontent = (
-                        self.footnotes[footnote][0].value
-                        + ' '
-                        + self.footnotes[footnote][0].content)
+                            elems[1:2] = newpars
+                elif isinstance(elems[0], elements.ValueDefinition):
+                    newparcontent = elems[0].value + ' ' + elems[0].content
                     newpar = elements.Paragraph(newparcontent)
-                    self.footnotes[footnote][0] = newpar
+                    elems[0] = newpar
 
-                # Merge consecutive paragraphs
-                newelems = list()
+                # Merge consecutive paragraphs, in place: the first kept
+                # elements of elems are the ones to keep
+                kept = 0
                 islastaparagraph = False
-                for elem in self.footnotes[footnote]:
+                for elem in elems:
                     if isinstance(elem, elements.Paragraph):
                         if islastaparagraph:
-                            newelems[-1].addcontent(elem.content)
-                        else:
-                            newelems.append(elem)
-                            islastaparagraph = True
+                            elems[kept - 1].addcontent(elem.content)
+                            continue
+                        islastaparagraph = True
                     elif (islastaparagraph
                           and isinstance(elem, elements.UnorderedListItem)):
                         # An U+2014 EM DASH has been mistaken for a list item
-                        newelems[-1].addcontent("— " + elem.content)
+                        elems[kept - 1].addcontent("— " + elem.content)
+                        continue
                     else:
-                        newelems.append(elem)
                         islastaparagraph = False
-                self.footnotes[footnote] = newelems
+                    elems[kept] = elem
+                    kept += 1
+                del elems[kept:]
 
     def fixfootnoterefs(self):
         '''fixfootnoterefs(self): Fix the contents for a known pattern.
@@ -250,45 +256,53 @@ class StructuredPage:
 
         This causes the footnote reference to be considered as code, and so does
         the following line.'''
-        todelete = list()
-        for i in range(1, len(self.elements)):
-            if not isinstance(self.elements[i], elements.Code):
-                continue
-            code = self.elements[i]
-            if not len(code.lines) >= 2:
-                continue
-            if not (utils.isint(code.lines[0][:-1])
-                    and code.lines[0][-1] == ')'):
-                continue
-            if not isinstance(self.elements[i - 1], elements.Text):
-                continue
-            prevtext = self.elements[i - 1]
-            firstline = code.lines[1] + code.lines[0].lstrip()
-            prevtext.addcontent(firstline)
-            for line in code.lines[2:]:
-                prevtext.addcontent(line)
-            todelete.append(i)
-
-        for i in reversed(todelete):
-            self.elements[i:i+1] = []
-
-    def _putfootnoteplaceholder(self, footnote):
-        regex = re.compile(fr"{footnote}\)")
-        placeholder = f"\x1bfootnote{footnote}\x1b"
+        elems = self.elements
+        # compacted in place: the first kept elements are the ones to keep
+        kept = 0
+        previous = None # the element before elem in the page, kept or not
+        for elem in elems:
+            # the cheap test first, most code does not end with a parenthesis
+            if (isinstance(elem, elements.Code)
+                    and len(elem.lines) >= 2
+                    and elem.lines[0][-1:] == ')'
+                    and utils.isint(elem.lines[0][:-1])
+                    and isinstance(previous, elements.Text)):
+                firstline = elem.lines[1] + elem.lines[0].lstrip()
+                previous.addcontent(firstline)
+                for line in elem.lines[2:]:
+                    previous.addcontent(line)
+            else:
+                elems[kept] = elem
+                kept += 1
+            previous = elem
+        del elems[kept:]
+
+    def _putfootnoteplaceholders(self, footnotes):
+        # Longest numbers first, so that "11)" is not taken for a "1)"
+        numbers = sorted(map(str, footnotes), key=len, reverse=True)
+        if not numbers:
+            return
+        regex = re.compile(f"({'|'.join(numbers)})\\)")
+        placeholder = "\x1bfootnote\\g<1>\x1b"
         for elem in self.elements:
             if isinstance(elem, elements.Code):
-                for i in range(len(elem.lines)):
-                    elem.lines[i], n = regex.subn(placeholder, elem.lines[i])
-                    if 0 < n:
-                        elem.footnotes.add(footnote)
+                for i, line in enumerate(elem.lines):
+                    found = regex.findall(line)
+                    if found:
+                        elem.lines[i] = regex.sub(placeholder, line)
+                        for footnote in found:
+                            elem.addfootnote(int(footnote))
             elif isinstance(elem, elements.Text):
-                if elem.content[:20] == "Forward references: ":
+                content = elem.content
+                if content.startswith("Forward references: "):
                     # contains a lot of sequences of the form "<number>)" that
                     # are never footnotes
                     continue
-                elem.content, n = regex.subn(placeholder, elem.content)
-                if 0 < n:
-                    elem.footnotes.add(footnote)
+                found = regex.findall(content)
+                if found:
+                    elem.content = regex.sub(placeholder, content)
+                    for footnote in found:
+                        elem.addfootnote(int(footnote))
 
     def putfootnoteplaceholders(self):
         r'''putfootnoteplaceholders(self): Replace footnote references with
@@ -298,8 +312,7 @@ class StructuredPage:
         references ("<number>)") with placeholders
         ("\x1bfootnote<number>\x1b"). Also registers them to the elements'
         footnote field where applicable.'''
-        for footnote in self.footnotes.keys():
-            self._putfootnoteplaceholder(footnote)
+        self._putfootnoteplaceholders(self.footnotes.keys())
 
 class CoverPage(StructuredPage):
     '''A piece of content preceded by a subheader and a title.
@@ -308,6 +321,8 @@ class CoverPage(StructuredPage):
         - subheader: list of str, the second header
         - title: str, the title line
         - see StructuredPage'''
+    __slots__ = ('subheader', 'title')
+
     def __init__(self, page, tocmatcher):
         '''Parameters:
             - page: Page, the page to parse
@@ -329,8 +344,13 @@ def mergepages(pages):
     Parameters:
         - pages: list of StructuredPage, the pages to merge
 
-    Return: type(pages[0]), the merged pages.'''
-    merge = copy.deepcopy(pages[0])
+    Return: type(pages[0]), the merged pages.
+
+    The elements are not copied, and may be modified in the merge: the pages
+    should not be used afterwards.'''
+    merge = copy.copy(pages[0])
+    merge.elements = list(pages[0].elements)
+    merge.footnotes = dict(pages[0].footnotes)
     for page in pages[1:]:
         # Is there a chance an element was split over two pages?
         # A Code (any subclass) plus a Code (strict)
@@ -9,6 +9,9 @@ import elements
 import toc
 import utils
 
+# A chapter number, as in the title of a chapter: "6."
+CHAPTERTITLEKEY = re.compile(fr"{toc.CHAPTERREGEX}\.")
+
 class LineParser:
     '''An aggregator of lines that turns them into elements.
 
@@ -25,21 +28,22 @@ class LineParser:
 
     def _parselinewithoutindent(self, line, tocmatcher):
         splits = line.split(maxsplit=1)
-        groups = utils.groupwords(line)
+        stripped = line.lstrip() # remove any indentation
+        leading = len(line) - len(stripped) # columns of indentation
         previous = self.elements[-1] if self.elements else None
-        if line.lstrip()[:20] == "Forward references: ":
+        if stripped.startswith("Forward references: "):
             # make it its own paragraph
             self.elements.append(elements.Paragraph(line))
             self._inelement = True
             return
-        if line[:8] == "o,u,x,X ":
+        if line.startswith("o,u,x,X "):
             # manual fix
             self.elements.append(elements.ValueDefinition(*splits))
             self._inelement = True
             return
         if tocmatcher.matchtitle(line):
-            if (re.match(toc.KEYREGEX, splits[0])
-                    or re.match(fr"{toc.CHAPTERREGEX}\.", splits[0])):
+            if (toc.KEY.match(splits[0])
+                    or CHAPTERTITLEKEY.match(splits[0])):
                 # numbered title
                 self.elements.append(elements.NumberedTitleHeading(line))
             else:
@@ -62,7 +66,7 @@ class LineParser:
             self._inelement = True
             return
         #print(splits)
-        if splits[0][:-1].isdigit() and splits[0][-1] == '.':
+        if splits[0][-1] == '.' and splits[0][:-1].isdigit():
             # ordered list
             self.elements.append(elements.OrderedListItem(line))
             self._inelement = True
@@ -83,26 +87,26 @@ class LineParser:
                                                  splits[1]))
                     self._inelement = True
                     return
-            if splits[0][:2] == "__" and splits[0][-2:] == "__":
+            if splits[0].startswith("__") and splits[0].endswith("__"):
                 # value definition of preprocessing macro
                 self.elements.append(elements.ValueDefinition(*splits))
                 self._inelement = True
                 return
 
-            if (not line[:2].isspace() # no or little indent
-                    and len(groups) == 2): # only 2 groups
-                stripped = line.lstrip() # remove any indentation
-                l = len(groups[0])
-                # if the second group starts between the 12th or 15th column,
-                # and there are at least 4 spaces between groups
-                if (12 <= stripped.find(groups[1], l) <= 15
-                        and stripped[l:l + 4].isspace()):
-                    # value definition of anything
-                    self.elements.append(elements.ValueDefinition(*groups))
-                    self._inelement = True
-                    return
+            if leading < 2: # no or little indent
+                groups = utils.groupwords(line)
+                if len(groups) == 2: # only 2 groups
+                    l = len(groups[0])
+                    # if the second group starts between the 12th or 15th
+                    # column, and there are at least 4 spaces between groups
+                    if (12 <= stripped.find(groups[1], l) <= 15
+                            and stripped[l:l + 4].isspace()):
+                        # value definition of anything
+                        self.elements.append(elements.ValueDefinition(*groups))
+                        self._inelement = True
+                        return
 
-        if line[:4].isspace():
+        if leading >= 4:
             # indented text?
             if self._inelement:
                 # maybe it's part of the previous element ?
@@ -115,8 +119,7 @@ class LineParser:
                         return True
                     if isinstance(previouselement, elements.UnorderedListItem):
                         indent = previouselement.indent + 2
-                        if (line[:indent].isspace()
-                                and not line[indent].isspace()):
+                        if leading == indent:
                             return True
                     return False
                 if maybepreviouselement(previous, line):
@@ -129,7 +132,7 @@ class LineParser:
                 self.elements.append(elements.Paragraph(line))
                 self._inelement = True
                 return
-            if line[:7].isspace():
+            if leading >= 7:
                 # code block
                 # we already checked for _inelement
                 self.elements.append(elements.Code(line))
@@ -2,12 +2,15 @@
 
 TOC stores various information about the table of contents.'''
 
+import itertools
 import re
+
 import utils
 
 ANNEXREGEX = r"[A-Z]\b"
 CHAPTERREGEX = r"\d+"
 KEYREGEX = fr"(({CHAPTERREGEX})|({ANNEXREGEX}))(\.\d+)+"
+KEY = re.compile(KEYREGEX)
 
 class TOC:
     '''A representation of the table of contents.
@@ -21,7 +24,8 @@ class TOC:
     def __init__(self, tocpages):
         '''Parameters:
             - tocpages: list of page.Page, the TOC pages'''
-        contents = sum(map((lambda p: p.content), tocpages), start=[])
+        contents = list(itertools.chain.from_iterable(p.content
+                                                      for p in tocpages))
         self.titleline = contents[0]
         self.titles = list()
         for line in contents[1:]:
@@ -29,7 +33,7 @@ class TOC:
                 continue
             try:
                 splits = line.split(maxsplit=1)
-                if re.fullmatch(KEYREGEX, splits[0]):
+                if KEY.fullmatch(splits[0]):
                     # numbered title, with dots
                     key = splits[0]
                     title = splits[1].split(' .', maxsplit=1)[0]